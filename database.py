@@ -1,7 +1,17 @@
 import sqlite3
 
+DB_PATH = 'smartlife.db' # Bir xil nom ishlating
+_conn = None
+
+def get_connection():
+    # Har so'rovda qayta ulanmaslik uchun bitta ulanishni qayta ishlatamiz
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH)
+    return _conn
+
 def init_db():
-    conn = sqlite3.connect('smartlife.db') # Bir xil nom ishlating
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS ideas (
@@ -12,27 +22,24 @@ def init_db():
         )
     ''')
     conn.commit()
-    conn.close()
 
 def save_idea(content, category="General"):
-    conn = sqlite3.connect('smartlife.db')
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO ideas (content, category) VALUES (?, ?)', (content, category))
+    conn = get_connection()
+    conn.execute('INSERT INTO ideas (content, category) VALUES (?, ?)', (content, category))
     conn.commit()
-    conn.close()
 
 def get_ideas():
-    conn = sqlite3.connect('smartlife.db')
-    cursor = conn.cursor()
+    conn = get_connection()
     # ID ni olish o'chirish tugmasi uchun shart
-    cursor.execute("SELECT id, content, category, timestamp FROM ideas ORDER BY id DESC")
-    ideas = cursor.fetchall()
-    conn.close()
-    return ideas
+    return conn.execute("SELECT id, content, category FROM ideas ORDER BY id DESC").fetchall()
 
 def delete_idea(idea_id):
-    conn = sqlite3.connect('smartlife.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM ideas WHERE id = ?", (idea_id,))
+    conn = get_connection()
+    conn.execute("DELETE FROM ideas WHERE id = ?", (idea_id,))
     conn.commit()
-    conn.close()
\ No newline at end of file
+
+def close_db():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
\ No newline at end of file
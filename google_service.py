@@ -1,14 +1,77 @@
 import os
 import json
 import os.path
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from config import SCOPES
 
+# Vazifalar O'zbekiston vaqti bo'yicha yaratiladi
+TIMEZONE = 'Asia/Tashkent'
+UTC_OFFSET = '+05:00'
+# Toshkentda yozgi vaqt yo'q, shuning uchun doimiy siljish yetarli (tzdata shart emas)
+CALENDAR_TZ = datetime.strptime(UTC_OFFSET, '%z').tzinfo
+EVENT_DURATION = timedelta(hours=1)
+# BILDIRISHNOMALAR (1h, 5h, 12h oldin)
+TIMED_REMINDERS = {
+    'useDefault': False,
+    'overrides': [
+        {'method': 'popup', 'minutes': 60},    # 1 soat oldin
+        {'method': 'popup', 'minutes': 300},   # 5 soat oldin
+        {'method': 'popup', 'minutes': 720},   # 12 soat oldin
+    ],
+}
+
+# Kunlik ro'yxat keshi: {sana: (tugash_vaqti, eventlar)}
+_events_cache = OrderedDict()
+EVENTS_CACHE_TTL = 10
+EVENTS_CACHE_SIZE = 256
+_events_lock = threading.Lock()
+# 403 rate limit / 429 / 5xx javoblarida googleapiclient o'zi
+# eksponensial kutish (jitter bilan) orqali shuncha marta qayta urinadi
+API_RETRIES = 5
+# Ro'yxatlarda faqat shu maydonlar ishlatiladi, qolganini Google yubormaydi
+EVENT_FIELDS = 'items(id,summary,start)'
+
+# build() discovery hujjatini har safar qayta o'qimasligi uchun servis keshi.
+# Funksiyalar asyncio.to_thread orqali chaqiriladi, httplib2 esa thread-safe
+# emas, shuning uchun har bir thread o'z servisini saqlaydi
+_local = threading.local()
+SERVICE_TTL = 30 * 60
+
+# Token JSON har safar qayta o'qilmaydi; muddati tugashiga shuncha qolganda yangilanadi
+_creds = None
+_creds_lock = threading.Lock()
+CREDS_REFRESH_SKEW = timedelta(minutes=5)
+
 def get_calendar_service():
+    service = getattr(_local, 'service', None)
+    if service is not None and time.monotonic() < _local.expires:
+        return service
+
+    _local.service = build('calendar', 'v3', credentials=get_credentials())
+    _local.expires = time.monotonic() + SERVICE_TTL
+    return _local.service
+
+def get_credentials():
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            _creds = _load_credentials()
+        elif (_creds.expiry and _creds.refresh_token
+                and _creds.expiry - datetime.utcnow() < CREDS_REFRESH_SKEW):
+            _creds.refresh(Request())
+        return _creds
+
+def _load_credentials():
     creds = None
     # Render Environment Variables orqali o'qish
     google_token = os.getenv('GOOGLE_TOKEN_JSON')
@@ -28,24 +91,46 @@ def get_calendar_service():
             # Muhim: Renderda buni ishlatish uchun avval lokalda token olish kerak
             raise PermissionError("Lokal token.json matnini GOOGLE_TOKEN_JSON ga qo'ying!")
             
-    return build('calendar', 'v3', credentials=creds)
+    return creds
 
 def get_events_for_date(target_date):
+    cached = _events_cache.get(target_date)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
     service = get_calendar_service()
     
     # O'zbekiston vaqti (+05:00) bo'yicha kunning boshi va oxiri
-    time_min = f"{target_date}T00:00:00+05:00"
-    time_max = f"{target_date}T23:59:59+05:00"
+    time_min = f"{target_date}T00:00:00{UTC_OFFSET}"
+    time_max = f"{target_date}T23:59:59{UTC_OFFSET}"
     
     events_result = service.events().list(
         calendarId='primary', 
         timeMin=time_min,
         timeMax=time_max,
         singleEvents=True,
-        orderBy='startTime'
-    ).execute()
+        orderBy='startTime',
+        fields=EVENT_FIELDS
+    ).execute(num_retries=API_RETRIES)
     
-    return events_result.get('items', [])
+    events = events_result.get('items', [])
+    # Bir vaqtda tugab qolmasligi uchun TTL ga ozgina tasodifiy qo'shimcha
+    expires = time.monotonic() + EVENTS_CACHE_TTL + random.uniform(0, 2)
+    # Funksiya bir nechta thread'dan chaqiriladi
+    with _events_lock:
+        _events_cache[target_date] = (expires, events)
+        _events_cache.move_to_end(target_date)
+        if len(_events_cache) > EVENTS_CACHE_SIZE:
+            _events_cache.popitem(last=False)
+    return events
+
+
+def invalidate_events(date_str=None):
+    with _events_lock:
+        if date_str:
+            _events_cache.pop(date_str, None)
+        else:
+            _events_cache.clear()
 
 
 def add_event(summary, date_str, time_str, description=""):
@@ -55,6 +140,8 @@ def add_event(summary, date_str, time_str, description=""):
         date_str = datetime.now().strftime("%Y-%m-%d")
 
     event = {
+        # Qayta urinishda dublikat yaratilmasligi uchun id ni o'zimiz beramiz
+        'id': uuid.uuid4().hex,
         'summary': summary,
         'description': description if description else "",
     }
@@ -63,20 +150,11 @@ def add_event(summary, date_str, time_str, description=""):
     if time_str and time_str != "null" and time_str != "NEED_CLARIFICATION":
         start_time = f"{date_str}T{time_str}:00"
         start_dt = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
-        end_dt = start_dt + timedelta(hours=1)
-        
-        event['start'] = {'dateTime': start_dt.isoformat(), 'timeZone': 'Asia/Tashkent'}
-        event['end'] = {'dateTime': end_dt.isoformat(), 'timeZone': 'Asia/Tashkent'}
+        end_dt = start_dt + EVENT_DURATION
         
-        # BILDIRISHNOMALAR (1h, 5h, 12h oldin)
-        event['reminders'] = {
-            'useDefault': False,
-            'overrides': [
-                {'method': 'popup', 'minutes': 60},    # 1 soat oldin
-                {'method': 'popup', 'minutes': 300},   # 5 soat oldin
-                {'method': 'popup', 'minutes': 720},   # 12 soat oldin
-            ],
-        }
+        event['start'] = {'dateTime': start_dt.isoformat(), 'timeZone': TIMEZONE}
+        event['end'] = {'dateTime': end_dt.isoformat(), 'timeZone': TIMEZONE}
+        event['reminders'] = TIMED_REMINDERS
     else:
         # Kunlik missiya (Muddat/Deadline uchun ham shu ishlaydi)
         event['start'] = {'date': date_str}
@@ -86,11 +164,26 @@ def add_event(summary, date_str, time_str, description=""):
         # lekin Google Calendar orqali standart 9:00 dagi eslatmani yoqish mumkin
         event['reminders'] = {'useDefault': True}
 
-    return service.events().insert(calendarId='primary', body=event).execute()
+    try:
+        created = service.events().insert(calendarId='primary', body=event).execute(num_retries=API_RETRIES)
+    except HttpError as e:
+        # Oldingi urinish saqlangan bo'lsa, shu id bilan 409 qaytadi
+        if e.resp.status != 409:
+            raise
+        created = event
+    invalidate_events(date_str)
+    return created
 
-def delete_event(event_id):
+def delete_event(event_id, date_str=None):
     service = get_calendar_service()
-    service.events().delete(calendarId='primary', eventId=event_id).execute()
+    try:
+        service.events().delete(calendarId='primary', eventId=event_id).execute(num_retries=API_RETRIES)
+    except HttpError as e:
+        # Qayta urinishdan oldin o'chib ulgurgan bo'lsa 410 qaytadi
+        if e.resp.status != 410:
+            raise
+    # Sana noma'lum bo'lsa butun keshni tozalaymiz
+    invalidate_events(date_str)
 
 def get_upcoming_events():
     service = get_calendar_service()
@@ -104,7 +197,8 @@ def get_upcoming_events():
         timeMin=time_min,
         timeMax=time_max,
         singleEvents=True,
-        orderBy='startTime'
-    ).execute()
+        orderBy='startTime',
+        fields=EVENT_FIELDS
+    ).execute(num_retries=API_RETRIES)
     
     return events_result.get('items', [])
\ No newline at end of file
@@ -1,16 +1,21 @@
 import asyncio
+import logging
 import os
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from config import BOT_TOKEN
 import processor
 import google_service
-from database import init_db, save_idea, get_ideas, delete_idea
+from database import init_db, save_idea, get_ideas, delete_idea, close_db
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from ciso8601 import parse_datetime
 
 
+logger = logging.getLogger(__name__)
+
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 USER_ID = "6150118850"
@@ -37,32 +42,40 @@ async def cmd_start(message: types.Message):
     await message.answer(welcome_text, parse_mode="Markdown")
 
 
-@dp.message(Command("list"))
-async def cmd_list(message: types.Message):
+# O'zgarmas "Orqaga" tugmasi va faqat shu tugmadan iborat klaviatura
+BACK_BUTTON = types.InlineKeyboardButton(text="⬅️ Orqaga", callback_data="back_to_list")
+BACK_KEYBOARD = types.InlineKeyboardMarkup(inline_keyboard=[[BACK_BUTTON]])
+
+
+@lru_cache(maxsize=1)
+def days_keyboard(today):
+    # 15 kunlik tugmalar kuniga bir marta quriladi (strftime sekin)
     builder = InlineKeyboardBuilder()
-    now = datetime.now()
-    # 15 kunlik ro'yxatni yaratish...
     for i in range(15):
-        day = now + timedelta(days=i)
+        day = today + timedelta(days=i)
         date_str = day.strftime("%Y-%m-%d")
         label = "Bugun" if i == 0 else "Ertaga" if i == 1 else day.strftime("%d-%b")
         builder.button(text=f"📅 {label}", callback_data=f"list_{date_str}")
     builder.adjust(3)
-    await message.answer("🗓 Qaysi kun rejalarini ko'rmoqchisiz?", reply_markup=builder.as_markup())
+    return builder.as_markup()
+
+
+@dp.message(Command("list"))
+async def cmd_list(message: types.Message):
+    await message.answer("🗓 Qaysi kun rejalarini ko'rmoqchisiz?", reply_markup=days_keyboard(date.today()))
 
 # 1. Vazifalar va Missiyalarni ajratilgan bitta hisobotda ko'rsatish
 @dp.callback_query(F.data.startswith("list_"))
 async def process_list_callback(callback: types.CallbackQuery):
     date_str = callback.data.split("_")[1]
-    events = google_service.get_events_for_date(date_str)
-    
-    builder = InlineKeyboardBuilder()
+    events = await asyncio.to_thread(google_service.get_events_for_date, date_str)
     
     if not events:
-        builder.row(types.InlineKeyboardButton(text="⬅️ Orqaga", callback_data="back_to_list"))
-        await callback.message.edit_text(f"📅 {date_str} kuni uchun reja topilmadi.", reply_markup=builder.as_markup())
+        await callback.message.edit_text(f"📅 {date_str} kuni uchun reja topilmadi.", reply_markup=BACK_KEYBOARD)
         return
 
+    builder = InlineKeyboardBuilder()
+
     timed_tasks = []    
     daily_missions = [] 
     
@@ -88,7 +101,7 @@ async def process_list_callback(callback: types.CallbackQuery):
     res += "⌛ **VAQTLI VAZIFALAR:**\n" + ("\n".join(timed_tasks) if timed_tasks else "(Bo'sh)") + "\n\n"
     res += "📋 **KUNLIK MISSIYALAR:**\n" + ("\n".join(daily_missions) if daily_missions else "(Bo'sh)")
 
-    builder.row(types.InlineKeyboardButton(text="⬅️ Orqaga", callback_data="back_to_list"))
+    builder.row(BACK_BUTTON)
     await callback.message.edit_text(res, reply_markup=builder.as_markup(), parse_mode="Markdown")
     await callback.answer()
 
@@ -101,47 +114,45 @@ async def delete_event_handler(callback: types.CallbackQuery):
     current_date = parts[2] # Sanani callback_data'dan olamiz
     
     try:
-        google_service.delete_event(event_id)
+        await asyncio.to_thread(google_service.delete_event, event_id, current_date)
         await callback.answer("✅ O'chirildi")
         
         # O'sha kunning ro'yxatini qayta yuklaymiz (Instant Refresh)
         callback.data = f"list_{current_date}"
         await process_list_callback(callback)
-    except Exception as e:
+    except Exception:
+        logger.exception("Vazifani o'chirishda xato")
         await callback.answer("❌ Xatolik!")
 
 
 @dp.callback_query(F.data == "back_to_list")
 async def back_to_list_menu(callback: types.CallbackQuery):
-    # cmd_list funksiyasidagi mantiqni edit_text orqali qaytaramiz
-    builder = InlineKeyboardBuilder()
-    now = datetime.now()
-    for i in range(15):
-        day = now + timedelta(days=i)
-        date_str = day.strftime("%Y-%m-%d")
-        label = "Bugun" if i == 0 else "Ertaga" if i == 1 else day.strftime("%d-%b")
-        builder.button(text=f"📅 {label}", callback_data=f"list_{date_str}")
-    
-    builder.adjust(3)
-    await callback.message.edit_text("🗓 Qaysi kun rejalari kerak?", reply_markup=builder.as_markup())
+    # cmd_list dagi klaviaturani edit_text orqali qaytaramiz
+    await callback.message.edit_text("🗓 Qaysi kun rejalari kerak?", reply_markup=days_keyboard(date.today()))
     await callback.answer()
 
 
 
 async def check_calendar_reminders():
     global sent_reminders
-    events = google_service.get_upcoming_events()
+    events = await asyncio.to_thread(google_service.get_upcoming_events)
     
-    now = datetime.now()
+    # Hozirgi vaqt bir marta, zonasi bilan olinadi (server zonasidan qat'i nazar)
+    now = datetime.now(timezone.utc)
     
     for event in events:
         event_id = event['id']
         summary = event.get('summary')
-        start_str = event['start'].get('dateTime', event['start'].get('date'))
+        start_str = event['start'].get('dateTime')
         
         # Google vaqtini Python vaqtiga o'tkazish
-        # Misol: 2026-01-10T22:30:00+05:00 -> datetime obyekti
-        start_dt = datetime.fromisoformat(start_str.replace('Z', '+00:00')).replace(tzinfo=None)
+        # Misol: 2026-01-10T22:30:00+05:00 -> datetime obyekti (zonasi saqlanadi)
+        if start_str:
+            start_dt = parse_datetime(start_str)
+        else:
+            # Kunlik missiya: 2026-01-10 -> o'sha kuni 00:00 (Asia/Tashkent)
+            start_day = date.fromisoformat(event['start']['date'])
+            start_dt = datetime.combine(start_day, time(), google_service.CALENDAR_TZ)
         
         # Agar vazifaga 2 daqiqadan kam vaqt qolgan bo'lsa VA hali xabar yuborilmagan bo'lsa
         diff = (start_dt - now).total_seconds() / 60
@@ -159,7 +170,6 @@ async def check_calendar_reminders():
 
 @dp.message(Command("ideas"))
 async def list_ideas(message: types.Message):
-    from database import get_ideas
     ideas = get_ideas()
     
     if not ideas:
@@ -170,7 +180,7 @@ async def list_ideas(message: types.Message):
     builder = InlineKeyboardBuilder()
     
     for idea in ideas:
-        idea_id, content, category, timestamp = idea
+        idea_id, content, category = idea
         # Markdown xatolarini oldini olish uchun matnni tozalaymiz yoki HTML ishlatamiz
         res += f"📁 **{category}**\n> {content}\n"
         res += "──────────────\n"
@@ -189,7 +199,6 @@ async def process_delete_idea(callback: types.CallbackQuery):
     idea_id = callback.data.split("_")[1]
     
     try:
-        from database import delete_idea
         delete_idea(idea_id) # Bazadan o'chiradi
         
         await callback.answer("✅ G'oya o'chirildi")
@@ -198,8 +207,8 @@ async def process_delete_idea(callback: types.CallbackQuery):
         await callback.message.edit_text(
             "🗑 G'oya o'chirildi! Yangilangan ro'yxatni ko'rish uchun qaytadan /ideas yozing."
         )
-    except Exception as e:
-        print(f"O'chirishda xato: {e}")
+    except Exception:
+        logger.exception("O'chirishda xato")
         await callback.answer("❌ O'chirishda xatolik yuz berdi")
 
 # 4. Ovozli xabarlar
@@ -218,7 +227,7 @@ async def handle_voice(message: types.Message):
         
         # 3. Groq Whisper orqali ovozni matnga o'girish
         await status_msg.edit_text("✍️ Matnga o'girilmoqda...")
-        text = processor.transcribe_voice(file_path)
+        text = await processor.transcribe_voice(file_path)
         
         if not text:
             await status_msg.edit_text("❌ Ovozdan matn ajratib bo'lmadi.")
@@ -226,7 +235,7 @@ async def handle_voice(message: types.Message):
 
         # 4. AI orqali matnni tahlil qilish
         await status_msg.edit_text("🧠 Tahlil qilinmoqda...")
-        result = processor.process_text_with_ai(text)
+        result = await processor.process_text_with_ai(text)
         
         # 5. Natijaga qarab ish tutish (Vazifa yoki G'oya)
         if result.get('type') == 'task':
@@ -244,7 +253,7 @@ async def handle_voice(message: types.Message):
                 return
 
             # Google Calendar-ga qo'shish
-            google_service.add_event(content, date_val, time_val, description)
+            await asyncio.to_thread(google_service.add_event, content, date_val, time_val, description)
             
             time_display = f"⏰ {time_val}" if time_val and time_val != "null" else "📅 Kun bo'yi"
             await status_msg.edit_text(
@@ -254,12 +263,11 @@ async def handle_voice(message: types.Message):
         
         else:
             # G'oya sifatida saqlash
-            from database import save_idea
             save_idea(result['content'], result.get('category', 'General'))
             await status_msg.edit_text(f"💡 G'oya saqlandi:\n📌 {result['content']}")
             
     except Exception as e:
-        print(f"Ovozli xabar xatosi: {e}")
+        logger.exception("Ovozli xabar xatosi")
         await status_msg.edit_text(f"❌ Xatolik yuz berdi: {e}")
         
     finally:
@@ -273,7 +281,7 @@ async def handle_text(message: types.Message):
     
     try:
         # AI tahlili
-        result = processor.process_text_with_ai(user_input)
+        result = await processor.process_text_with_ai(user_input)
         
         # 1. Vazifa (task) bo'lsa
         if result.get('type') == 'task':
@@ -283,7 +291,7 @@ async def handle_text(message: types.Message):
             desc = result.get('description', "")
 
             # Google Calendar-ga yuborish
-            google_service.add_event(content, date_val, time_val, desc)
+            await asyncio.to_thread(google_service.add_event, content, date_val, time_val, desc)
             
             time_msg = f"⏰ {time_val}" if time_val and time_val != "null" else "📅 Kun bo'yi"
             await message.answer(
@@ -292,13 +300,12 @@ async def handle_text(message: types.Message):
             
         # 2. G'oya (idea) bo'lsa
         elif result.get('type') == 'idea':
-            from database import save_idea
             # G'oya matnini to'liq saqlash
             save_idea(result['content'], result.get('category', 'General'))
             await message.answer(f"💡 G'oya saqlandi:\n📌 {result['content']}")
 
-    except Exception as e:
-        print(f"Xato: {e}")
+    except Exception:
+        logger.exception("Xato")
         await message.answer("❌ Xatolik yuz berdi. Qayta urinib ko'ring.")
 
 
@@ -306,15 +313,27 @@ async def main():
     scheduler = AsyncIOScheduler()
     # Har 1 daqiqada tekshirish
     scheduler.add_job(check_calendar_reminders, 'interval', minutes=1)
+    # Google tokenini muddati tugashidan oldin fonda yangilash
+    # (oddiy funksiya bo'lgani uchun scheduler uni alohida thread'da ishlatadi)
+    scheduler.add_job(google_service.get_credentials, 'interval', minutes=1)
+    # Ishga tushganda token va Calendar servisini oldindan tayyorlab qo'yish,
+    # shunda birinchi foydalanuvchi so'rovi kutib qolmaydi
+    scheduler.add_job(google_service.get_calendar_service)
     scheduler.start()
     
-    print("Bot va Eslatmalar ishga tushdi...")
+    logger.info("Bot va Eslatmalar ishga tushdi...")
     await dp.start_polling(bot)
     try:
-        print("Bot ishga tushdi...")
+        logger.info("Bot ishga tushdi...")
         await dp.start_polling(bot)
     finally:
         await bot.session.close()
+        close_db()
 
 if __name__ == "__main__":
+    # Kutubxonalar (apscheduler, httpx, aiogram) faqat WARNING dan yuqorisini yozadi,
+    # bizning modullar esa INFO ni ham
+    logging.basicConfig(level=logging.WARNING)
+    for name in (__name__, "processor"):
+        logging.getLogger(name).setLevel(logging.INFO)
     asyncio.run(main())
\ No newline at end of file
@@ -1,17 +1,25 @@
+from collections import OrderedDict
 from datetime import datetime
-from groq import Groq
-import json
+from groq import AsyncGroq
+import hashlib
+import logging
+import orjson
 import os
+import re
 from config import GROQ_API_KEY
 
-client = Groq(api_key=GROQ_API_KEY)
+logger = logging.getLogger(__name__)
 
-def process_text_with_ai(user_text):
-    today = datetime.now().strftime("%Y-%m-%d")
+# 429/5xx va ulanish xatolarida SDK o'zi eksponensial kutish (jitter bilan,
+# Retry-After ni hisobga olib) orqali qayta urinadi
+client = AsyncGroq(api_key=GROQ_API_KEY, max_retries=4)
 
-    # Matnni aniq chegaralash va JSON formatini qat'iylashtirish
-    prompt = f"""
-Today is {today}.
+# Bir xil matn uchun AI javobini qayta so'ramaslik: {sha256: natija}
+_ai_cache = OrderedDict()
+AI_CACHE_SIZE = 256
+
+# Qoidalar bloki system xabar sifatida yuboriladi; o'zgaruvchan sana oxirida turadi
+_SYSTEM = """
 Rules:
 1. If the text contains keywords like "deadline", "muddat", "sana", or "date", ALWAYS set "type": "task".
 2. If it is a general thought or information without a timeline, set "type": "idea".
@@ -27,24 +35,69 @@ Return ONLY JSON:
     "time": "HH:MM" or null,
     "category": "category"
 }}
+
+Today is {today}.
 """
 
+# Model JSON atrofiga izoh yoki ``` qo'shib yuborsa, ichidagi obyektni ajratib olamiz
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+def _parse_json(text):
     try:
-        # AIga foydalanuvchi matnini aniq ko'rsatamiz
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt + f"\n\nUser's Original Text: {user_text}"}],
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        match = _JSON_RE.search(text)
+        if not match:
+            raise
+        return orjson.loads(match.group(0))
+
+_TIME_RE = re.compile(r'\d{1,2}:\d{2}')
+
+def _is_cacheable(result):
+    # Faqat handlerlar xatosiz ishlata oladigan natijani keshlaymiz,
+    # aks holda "qayta urinish" ham o'sha buzuq javobni olardi
+    if result.get("type") not in ("task", "idea"):
+        return False
+    content = result.get("content")
+    if not isinstance(content, str) or not content.strip():
+        return False
+    time_val = result.get("time")
+    return time_val is None or (isinstance(time_val, str) and bool(_TIME_RE.fullmatch(time_val)))
+
+async def process_text_with_ai(user_text):
+    today = datetime.now().strftime("%Y-%m-%d")
+    key = hashlib.sha256(f"{today}\n{user_text}".encode()).hexdigest()
+
+    try:
+        if key in _ai_cache:
+            _ai_cache.move_to_end(key)
+            return dict(_ai_cache[key])
+
+        # Qoidalar system xabarda, foydalanuvchi matni alohida user xabarida
+        chat_completion = await client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": _SYSTEM.format(today=today)},
+                {"role": "user", "content": user_text},
+            ],
             model="llama-3.3-70b-versatile",
             response_format={"type": "json_object"}
         )
-        return json.loads(chat_completion.choices[0].message.content)
-    except Exception as e:
-        print(f"AI Error: {e}")
+        result = _parse_json(chat_completion.choices[0].message.content)
+        if not isinstance(result, dict):
+            raise ValueError(f"JSON obyekt kutilgan edi: {type(result).__name__}")
+        if _is_cacheable(result):
+            _ai_cache[key] = result
+            if len(_ai_cache) > AI_CACHE_SIZE:
+                _ai_cache.popitem(last=False)
+        return dict(result)
+    except Exception:
+        logger.exception("AI Error")
         # Xatolik yuz bersa, matnni asl holicha qaytaramiz
         return {"type": "idea", "content": user_text, "category": "General", "date": today, "time": None}
 
-def transcribe_voice(file_path):
+async def transcribe_voice(file_path):
     with open(file_path, "rb") as file:
-        transcription = client.audio.transcriptions.create(
+        transcription = await client.audio.transcriptions.create(
             file=(file_path, file.read()),
             model="whisper-large-v3",
             response_format="text"